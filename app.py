@@ -1,5 +1,8 @@
-from flask import Flask, render_template, request
-from program import load_floors, find_best_slot
+from flask import Flask, render_template, request, jsonify, g, Response, abort, url_for
+from program import load_floors, find_best_slot, build_slot_index, availability as slot_availability
+from garages import GarageRegistry, load_garage_config
+import metrics
+import cProfile
 import time
 import os
 
@@ -13,15 +16,170 @@ ALGO_CHOICES = {
     'all': 'Run all'
 }
 
+# When set, workers attach to the shared map generations published under this
+# directory, one subdirectory per garage (see mapstore.publish_shared), instead
+# of loading their own copy.
+SHARED_MAPS_DIR = os.environ.get('PARKING_SHARED_MAPS')
+
+# How often, at most, a worker looks for a newer shared map generation.
+SHARED_MAPS_CHECK_SECONDS = 1.0
+
+# When set, each garage loads the precompiled artifact next to its maps folder
+# (see mapstore.py) instead of parsing the CSVs. Off by default: for maps the
+# size of the bundled ones it is no faster and adds the NumPy import.
+USE_MAP_ARTIFACTS = os.environ.get('PARKING_MAP_ARTIFACTS', '') not in ('', '0')
+
+# When set, a request carrying an `X-Profile: 1` header is run under cProfile
+# and the stats are written to this directory (named in `X-Profile-File`).
+PROFILE_DIR = os.environ.get('PARKING_PROFILE_DIR')
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAPS_DIR = os.path.join(BASE_DIR, 'maps')
+
+# The garage behind the original /, /find and /availability routes.
+DEFAULT_GARAGE = 'default'
+
+
+def load_maps(maps_dir):
+    # A precompiled artifact sits next to its folder, e.g. maps/ -> maps.npz.
+    artifact_path = os.path.normpath(maps_dir) + '.npz'
+    with metrics.timed('map_load'):
+        if USE_MAP_ARTIFACTS and os.path.exists(artifact_path):
+            # Only pay for the NumPy import when there is an artifact to load.
+            from mapstore import load_building
+            return load_building(maps_dir, artifact_path)
+        floors = load_floors(maps_dir)
+        return {'floors': floors, 'slot_index': build_slot_index(floors), 'arrays': None}
+
+
+def load_garage(garage_id, maps_dir):
+    if SHARED_MAPS_DIR:
+        from mapstore import attach_shared
+        shared_root = os.path.join(SHARED_MAPS_DIR, garage_id)
+        with metrics.timed('map_load'):
+            building = attach_shared(shared_root, maps_dir)
+        building['shared_root'] = shared_root
+        building['checked_at'] = time.monotonic()
+        return building
+    return load_maps(maps_dir)
+
+
+def is_current(building):
+    # A newer published generation replaces a shared building on the first
+    # request after it is noticed. CURRENT is only read when a stat() shows it
+    # was replaced.
+    shared_root = building.get('shared_root')
+    if shared_root is None:
+        return True
+    if building.get('outdated'):
+        return False
+    now = time.monotonic()
+    if now - building['checked_at'] < SHARED_MAPS_CHECK_SECONDS:
+        return True
+    building['checked_at'] = now
+    from mapstore import current_stamp, current_generation
+    stamp = current_stamp(shared_root)
+    if stamp == building['stamp']:
+        return True
+    if current_generation(shared_root) != building['generation']:
+        building['outdated'] = True
+        return False
+    building['stamp'] = stamp
+    return True
+
+
+# Garages served under /g/<garage_id>/, configured by the JSON file named in
+# PARKING_GARAGES (see garages.py) and cached within PARKING_GARAGE_BUDGET_MB.
+# Floors and their free-slot index are loaded once per garage and kept in step
+# by set_slot_occupied() whenever occupancy changes.
+garage_registry = GarageRegistry(
+    load_garage_config(os.environ.get('PARKING_GARAGES'), MAPS_DIR),
+    load_garage,
+    int(os.environ.get('PARKING_GARAGE_BUDGET_MB', '64')) * 1024 * 1024,
+    is_current=is_current,
+)
+
+
+def get_building():
+    return garage_registry.get(DEFAULT_GARAGE)
+
+
+def get_garage(garage_id):
+    if garage_id not in garage_registry:
+        abort(404)
+    return garage_registry.get(garage_id)
+
+
+@app.before_request
+def start_profile():
+    if PROFILE_DIR and request.headers.get('X-Profile') == '1':
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@app.after_request
+def stop_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{request.endpoint}-{time.time_ns()}.prof")
+        profiler.dump_stats(path)
+        response.headers['X-Profile-File'] = path
+    return response
+
 
 @app.route('/', methods=['GET'])
 def index():
-    return render_template('index.html', algos=ALGO_CHOICES)
+    return render_template('index.html', algos=ALGO_CHOICES, find_url=url_for('find'))
+
+
+@app.route('/g/<garage_id>/', methods=['GET'])
+def garage_index(garage_id):
+    if garage_id not in garage_registry:
+        abort(404)
+    return render_template('index.html', algos=ALGO_CHOICES, find_url=url_for('garage_find', garage_id=garage_id))
+
+
+@app.route('/availability', methods=['GET'])
+def availability():
+    return _availability(get_building())
+
+
+@app.route('/g/<garage_id>/availability', methods=['GET'])
+def garage_availability(garage_id):
+    return _availability(get_garage(garage_id))
+
+
+def _availability(building):
+    counts = slot_availability(building['slot_index'])
+    floors = [{'floor': z, **counts[z]} for z in sorted(counts)]
+    total = {t: sum(f[t] for f in floors) for t in ('P', 'L', 'D')}
+    return jsonify({'floors': floors, 'total': total})
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/find', methods=['POST'])
 def find():
+    return _find(DEFAULT_GARAGE, url_for('index'))
+
+
+@app.route('/g/<garage_id>/find', methods=['POST'])
+def garage_find(garage_id):
+    if garage_id not in garage_registry:
+        abort(404)
+    return _find(garage_id, url_for('garage_index', garage_id=garage_id))
+
+
+def _find(garage_id, index_url):
     try:
+        # Loaded inside the try so a map load failure gets the usual error page.
+        building = garage_registry.get(garage_id)
         algo = request.form.get('algorithm', 'a_star')
         ptype = request.form.get('parking_type', 'P')
         desired_floor_str = request.form.get('desired_floor', '').strip()
@@ -33,9 +191,7 @@ def find():
             w_lobby, w_car = 1, 2
         show_path = request.form.get('show_path') == 'on'
 
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        maps_dir = os.path.join(base_dir, 'maps')
-        floors = load_floors(maps_dir)
+        floors = building['floors']
 
         algos = []
         if algo == 'all':
@@ -46,7 +202,7 @@ def find():
         results = []
         for a in algos:
             start_time = time.time()
-            result = find_best_slot(floors, a, ptype, desired_floor, w_lobby, w_car)
+            result = find_best_slot(floors, a, ptype, desired_floor, w_lobby, w_car, slot_index=building['slot_index'])
             end_time = time.time()
             exec_time = end_time - start_time
             exec_time_str = f"{exec_time:.4f}s"
@@ -147,7 +303,8 @@ def find():
             results_with_overlays.sort(key=lambda it: (it['result'].get('exec_time') if it['result'].get('exec_time') is not None else float('inf')))
 
         # pass Python's enumerate into Jinja context for indexing floors
-        return render_template('result.html', results=results_with_overlays, show_path=show_path, floors=floors, enumerate=enumerate)
+        with metrics.timed('rendering'):
+            return render_template('result.html', results=results_with_overlays, show_path=show_path, floors=floors, enumerate=enumerate, index_url=index_url)
     except Exception as e:
         return f"An error occurred: {str(e)}", 500
 
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# ---------- GARAGE REGISTRY ----------
+# Serves several garages from one process. Each garage id maps to its own maps
+# folder; its building (floors, slot index, precomputed arrays) is loaded on
+# first use, cached, and evicted least-recently-used first once the cached
+# garages exceed the memory budget.
+#
+# The config is a JSON object of garage id -> maps folder, relative paths being
+# resolved against the config file, e.g. {"north": "garages/north/maps"}.
+
+
+def load_garage_config(path, default_maps_dir):
+    # "default" backs the original routes and is the bundled maps/ folder unless
+    # the config names it. A configured path that does not exist is an error,
+    # so a typo cannot quietly route every site to the bundled maps.
+    garages = {"default": default_maps_dir}
+    if not path:
+        return garages
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Garage config {path} (PARKING_GARAGES) does not exist.")
+    with open(path) as f:
+        config = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    garages.update({garage_id: os.path.join(base_dir, maps_dir) for garage_id, maps_dir in config.items()})
+    return garages
+
+
+def building_size(building):
+    # Rough footprint in bytes: grid lists, slot index sets and NumPy arrays.
+    # A shared generation is searched in place, so its arrays are all of it.
+    if "generation" in building:
+        return sum(arr.nbytes for arr in building["arrays"].values())
+    size = 0
+    for floor in building["floors"]:
+        size += sys.getsizeof(floor) + sum(sys.getsizeof(row) for row in floor)
+    for free in building["slot_index"].values():
+        size += sys.getsizeof(free) + len(free) * 64
+    if building.get("arrays"):
+        size += sum(arr.nbytes for arr in building["arrays"].values())
+    return size
+
+
+class GarageRegistry:
+    def __init__(self, garages, loader, budget_bytes, is_current=None):
+        # loader(garage_id, maps_dir) builds a garage; is_current(building)
+        # may report a cached building as outdated so it is loaded again.
+        self.garages = dict(garages)
+        self.loader = loader
+        self.is_current = is_current
+        self.budget_bytes = budget_bytes
+        self._cache = OrderedDict()  # garage id -> (building, size), oldest first
+        self._lock = threading.Lock()
+        self._load_locks = {garage_id: threading.Lock() for garage_id in self.garages}
+
+    def __contains__(self, garage_id):
+        return garage_id in self.garages
+
+    def loaded(self):
+        with self._lock:
+            return list(self._cache)
+
+    def get(self, garage_id):
+        # Raises KeyError for an unknown garage id.
+        maps_dir = self.garages[garage_id]
+        building = self._cached(garage_id)
+        if building is not None:
+            return building
+
+        # Only one thread loads a given garage; the others wait and reuse it.
+        with self._load_locks[garage_id]:
+            building = self._cached(garage_id)
+            if building is not None:
+                return building
+            building = self.loader(garage_id, maps_dir)
+            with self._lock:
+                self._cache[garage_id] = (building, building_size(building))
+                self._evict(keep=garage_id)
+            return building
+
+    def _cached(self, garage_id):
+        with self._lock:
+            entry = self._cache.get(garage_id)
+            if entry is None:
+                return None
+            self._cache.move_to_end(garage_id)
+        if self.is_current is not None and not self.is_current(entry[0]):
+            return None
+        return entry[0]
+
+    def _evict(self, keep):
+        total = sum(size for _, size in self._cache.values())
+        for garage_id in list(self._cache):
+            if total <= self.budget_bytes:
+                break
+            if garage_id == keep:
+                continue
+            total -= self._cache.pop(garage_id)[1]
@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode, urlsplit
+
+# ---------- LOAD TEST ----------
+# Starts the app locally (or targets --url) and replays a mix of /find requests
+# with a fixed number of concurrent asyncio clients, then reports throughput
+# and latency percentiles. Uses only the standard library and never leaves
+# localhost unless told to.
+#
+#   python loadtest.py --requests 500 --concurrency 16
+#   python loadtest.py --trace trace.jsonl --concurrency 8
+#   python loadtest.py --requests 200 --write-trace trace.jsonl
+#
+# A trace is one JSON object per line with the /find form fields, e.g.
+#   {"algorithm": "a_star", "parking_type": "L", "desired_floor": 3, "preference": "lobby"}
+
+ALGORITHMS = ["a_star", "dijkstra", "bfs", "greedy_bfs"]
+
+
+def generate_mix(n, seed=0, floors=12):
+    rng = random.Random(seed)
+    mix = []
+    for _ in range(n):
+        mix.append({
+            # "Run all" is the slow comparison page; keep it rare like in real use.
+            "algorithm": "all" if rng.random() < 0.05 else rng.choice(ALGORITHMS),
+            "parking_type": rng.choices(["P", "L", "D"], weights=[8, 1, 1])[0],
+            "desired_floor": rng.randrange(floors) if rng.random() < 0.5 else None,
+            "preference": rng.choice(["lobby", "car"]),
+            "show_path": rng.random() < 0.1,
+        })
+    return mix
+
+
+def read_trace(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_trace(path, mix):
+    with open(path, "w") as f:
+        for item in mix:
+            f.write(json.dumps(item) + "\n")
+
+
+def encode_form(item):
+    form = {
+        "algorithm": item.get("algorithm", "a_star"),
+        "parking_type": item.get("parking_type", "P"),
+        "desired_floor": "" if item.get("desired_floor") is None else str(item["desired_floor"]),
+        "preference": item.get("preference", "lobby"),
+    }
+    if item.get("show_path"):
+        form["show_path"] = "on"
+    return urlencode(form).encode()
+
+
+async def post(host, port, path, body):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(
+            f"POST {path} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Content-Type: application/x-www-form-urlencoded\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        while await reader.read(65536):
+            pass
+        parts = status_line.split()
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise ValueError(f"Malformed status line: {status_line!r}")
+        return int(parts[1])
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, mix, concurrency, timeout):
+    queue = asyncio.Queue()
+    for item in mix:
+        queue.put_nowait(item)
+    latencies = []  # successful requests only
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(post(host, port, "/find", encode_form(item)), timeout)
+            except Exception:
+                # Refused or dropped connections, timeouts and garbled replies
+                # all count as failed requests; the run carries on.
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile.
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port), "--with-threads"],
+        cwd=base_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Flask app exited during start-up.")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("Flask app did not start listening in time.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /find endpoint.")
+    parser.add_argument("--url", help="target a running app instead of starting one, e.g. http://127.0.0.1:5000")
+    parser.add_argument("--trace", help="JSONL trace of /find requests to replay")
+    parser.add_argument("--write-trace", help="save the generated request mix as JSONL and exit")
+    parser.add_argument("--requests", type=int, default=200, help="number of generated requests")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a request counts as failed")
+    args = parser.parse_args()
+
+    mix = read_trace(args.trace) if args.trace else generate_mix(args.requests, args.seed)
+    if args.write_trace:
+        write_trace(args.write_trace, mix)
+        print(f"Wrote {len(mix)} requests to {args.write_trace}")
+        return
+
+    proc = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        proc = start_server(port)
+
+    try:
+        latencies, errors, elapsed = asyncio.run(run_load(host, port, mix, args.concurrency, args.timeout))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    latencies.sort()
+    print(f"Requests:    {len(latencies) + errors} ({len(latencies)} ok, {errors} failed) with concurrency {args.concurrency}")
+    print(f"Elapsed:     {elapsed:.2f} s")
+    print(f"Throughput:  {len(latencies) / elapsed:.1f} successful req/s")
+    if not latencies:
+        print("Latency of successful requests: n/a (none succeeded)")
+        return
+    print("Latency of successful requests:")
+    for p in (50, 95, 99):
+        print(f"  p{p}:       {percentile(latencies, p) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
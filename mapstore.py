@@ -0,0 +1,430 @@
+import bisect
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from program import load_floors, build_slot_index, SLOT_TYPES
+
+# ---------- PRECOMPILED MAP ARTIFACT ----------
+# `python mapstore.py compile` turns the CSV floors in maps/ into one .npz file
+# holding what the app builds at start-up:
+#
+#   symbols              every distinct cell string, grid codes index into it
+#   codes                (floors, rows, cols) grid codes, the smallest unsigned
+#                        dtype that fits len(symbols)
+#   slot_cells           free slot cells as y * cols + x, grouped by floor and then
+#                        by SLOT_TYPES, each group in row order
+#   slot_offsets         group z * len(SLOT_TYPES) + t spans slot_cells[offsets[g]:offsets[g + 1]]
+#   source_digest        sha1 of the CSV files the artifact was built from
+
+DEFAULT_ARTIFACT = "maps.npz"
+
+
+def maps_digest(folder):
+    # Hashes raw bytes only (no CSV parsing) so checking staleness stays cheap.
+    h = hashlib.sha1()
+    for name in sorted(f for f in os.listdir(folder) if f.endswith(".csv")):
+        h.update(name.encode())
+        with open(os.path.join(folder, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def compile_arrays(floors, digest=""):
+    symbols = sorted({cell for floor in floors for row in floor for cell in row})
+    lookup = {s: i for i, s in enumerate(symbols)}
+    code_type = np.min_scalar_type(max(len(symbols) - 1, 0))
+    codes = np.array([[[lookup[c] for c in row] for row in floor] for floor in floors], dtype=code_type)
+
+    slot_index = build_slot_index(floors)
+    width = codes.shape[2]
+    slot_cells = []
+    slot_offsets = [0]
+    for z in range(len(floors)):
+        for t in SLOT_TYPES:
+            slot_cells.extend(sorted(y * width + x for _, y, x in slot_index[(z, t)]))
+            slot_offsets.append(len(slot_cells))
+    return {
+        "symbols": np.array(symbols),
+        "codes": codes,
+        "source_digest": np.array(digest),
+        "slot_cells": np.array(slot_cells, dtype=np.int32),
+        "slot_offsets": np.array(slot_offsets, dtype=np.int32),
+    }
+
+
+def _slot_groups(arrays):
+    # Yields (z, slot type, lo, hi) for every group of the free-slot table.
+    offsets = arrays["slot_offsets"].tolist()
+    for g in range(len(offsets) - 1):
+        z, t = divmod(g, len(SLOT_TYPES))
+        yield z, SLOT_TYPES[t], offsets[g], offsets[g + 1]
+
+
+def building_from_arrays(arrays):
+    # Rebuilds the structures program.py works with; no CSV parsing involved.
+    floors = arrays["symbols"][arrays["codes"]].tolist()
+    width = arrays["codes"].shape[2]
+    cells = arrays["slot_cells"].tolist()
+    slot_index = {}
+    for z, t, lo, hi in _slot_groups(arrays):
+        slot_index[(z, t)] = {(z, cell // width, cell % width) for cell in cells[lo:hi]}
+    return {"floors": floors, "slot_index": slot_index, "arrays": arrays}
+
+
+def compile_maps(maps_dir, artifact_path):
+    floors = load_floors(maps_dir)
+    arrays = compile_arrays(floors, maps_digest(maps_dir))
+    np.savez(artifact_path, **arrays)
+    return arrays
+
+
+def load_building(maps_dir, artifact_path=None):
+    # Uses the artifact when it was built from the current CSVs, otherwise
+    # falls back to parsing maps/.
+    if artifact_path and os.path.exists(artifact_path):
+        with np.load(artifact_path) as data:
+            if str(data["source_digest"]) == maps_digest(maps_dir):
+                return building_from_arrays({k: data[k] for k in data.files})
+    floors = load_floors(maps_dir)
+    return {"floors": floors, "slot_index": build_slot_index(floors), "arrays": None}
+
+
+# ---------- SHARED MAP GENERATIONS ----------
+# Multi-process servers (gunicorn, uwsgi, ...) attach to one read-only file per
+# map generation instead of each worker compiling its own. The file is a raw
+# layout that maps straight onto NumPy arrays:
+#
+#   8 bytes  little-endian header length
+#   header   JSON {name: [dtype, shape, offset]}
+#   data     each array at a 64-byte aligned offset
+#
+# `CURRENT` in the same directory names the live generation. Publishing writes
+# a new generation file and then swaps `CURRENT` with os.replace(), so workers
+# see either the old or the new generation, never a half-written one. Both
+# sides coordinate through an flock on `LOCK` (POSIX only).
+#
+# Workers search the mapped arrays in place through SharedFloors and
+# SharedSlotSet (below), so the grid and the free-slot table exist once however
+# many workers there are. Occupancy changes stay private to the process that
+# makes them and only copy what they touch.
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"
+_ALIGN = 64
+
+
+def _write_raw(arrays, path):
+    header = {}
+    offset = 0
+    for name, arr in arrays.items():
+        offset = -(-offset // _ALIGN) * _ALIGN
+        header[name] = [arr.dtype.str, list(arr.shape), offset]
+        offset += arr.nbytes
+    header_bytes = json.dumps(header).encode()
+    data_start = -(-(8 + len(header_bytes)) // _ALIGN) * _ALIGN
+
+    with open(path, "wb") as f:
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, arr in arrays.items():
+            f.seek(data_start + header[name][2])
+            f.write(np.ascontiguousarray(arr).tobytes())
+
+
+def _map_raw(path):
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header_len = int.from_bytes(buf[:8], "little")
+    header = json.loads(buf[8:8 + header_len])
+    data_start = -(-(8 + header_len) // _ALIGN) * _ALIGN
+
+    arrays = {}
+    for name, (dtype, shape, offset) in header.items():
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape)) if shape else 1
+        if count == 0:
+            # An empty array may sit at the very end of the file, where
+            # frombuffer() rejects the offset.
+            arrays[name] = np.empty(shape, dtype)
+            continue
+        # Views into the page cache: every process mapping this file shares them.
+        arrays[name] = np.frombuffer(buf, dtype, count, data_start + offset).reshape(shape)
+    return arrays
+
+
+def current_stamp(root):
+    # Changes whenever CURRENT is replaced; costs one stat() instead of a read.
+    try:
+        st = os.stat(os.path.join(root, CURRENT_FILE))
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def current_generation(root):
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def _locked(root, exclusive):
+    # Publishers hold the lock exclusively while writing, swapping and cleaning
+    # up; attaching workers hold it shared from reading CURRENT until the file
+    # is mapped, so a generation cannot disappear in between.
+    with open(os.path.join(root, LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def publish_shared(maps_dir, root, if_missing=False):
+    # With if_missing, only publishes when no generation is live yet, so
+    # workers starting together publish once between them.
+    os.makedirs(root, exist_ok=True)
+    with _locked(root, exclusive=True):
+        previous = current_generation(root)
+        if if_missing and previous is not None:
+            return previous
+
+        floors = load_floors(maps_dir)
+        if not floors:
+            raise FileNotFoundError(f"No floor CSV files in {maps_dir}, nothing to publish.")
+        arrays = compile_arrays(floors, maps_digest(maps_dir))
+        digest = str(arrays["source_digest"])
+        generation = f"gen-{time.time_ns()}-{digest[:12]}.bin"
+
+        tmp_path = os.path.join(root, generation + ".tmp")
+        _write_raw(arrays, tmp_path)
+        os.replace(tmp_path, os.path.join(root, generation))
+
+        tmp_current = os.path.join(root, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+        with open(tmp_current, "w") as f:
+            f.write(generation)
+        os.replace(tmp_current, os.path.join(root, CURRENT_FILE))
+
+        # Keep the previous generation for workers that have not swapped yet;
+        # anything older has been replaced twice and is removed.
+        for name in os.listdir(root):
+            if name.startswith("gen-") and name.endswith(".bin") and name not in (generation, previous):
+                try:
+                    os.remove(os.path.join(root, name))
+                except OSError:
+                    pass
+    return generation
+
+
+def attach_shared(root, maps_dir=None):
+    # Attaches to the live generation, publishing one from maps_dir first if
+    # there is none yet.
+    if current_generation(root) is None:
+        if maps_dir is None:
+            raise FileNotFoundError(f"No map generation published in {root} and no maps folder to publish from.")
+        publish_shared(maps_dir, root, if_missing=True)
+    with _locked(root, exclusive=False):
+        stamp = current_stamp(root)
+        generation = current_generation(root)
+        arrays = _map_raw(os.path.join(root, generation))
+    return {
+        "floors": SharedFloors(arrays),
+        "slot_index": shared_slot_index(arrays),
+        "arrays": arrays,
+        "generation": generation,
+        "stamp": stamp,
+    }
+
+
+def measure_cold_start(maps_dir, artifact_path, repeat=20):
+    # Both paths produce the same building (floors + slot index), so the
+    # numbers compare like for like. NumPy's import is timed in a fresh
+    # interpreter because only the artifact path has to pay for it.
+    def best_of(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def from_csv():
+        floors = load_floors(maps_dir)
+        build_slot_index(floors)
+
+    def run_python(code):
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    csv_time = best_of(from_csv)
+    artifact_time = best_of(lambda: load_building(maps_dir, artifact_path))
+    numpy_import_time = max(0.0, best_of(lambda: run_python("import numpy")) - best_of(lambda: run_python("pass")))
+    return csv_time, artifact_time, numpy_import_time
+
+
+# ---------- SHARED VIEWS ----------
+# Stand-ins for the floors lists and slot index sets that read the mapped
+# arrays directly, so program.py searches a shared generation unchanged:
+# floors[z][y][x] decodes one code through the symbol table on access.
+
+class SharedFloors:
+    def __init__(self, arrays):
+        symbols = arrays["symbols"].tolist()
+        codes = memoryview(arrays["codes"].reshape(-1))
+        depth, height, width = arrays["codes"].shape
+        self._floors = [_SharedFloor(codes, z * height * width, height, width, symbols) for z in range(depth)]
+
+    def __len__(self):
+        return len(self._floors)
+
+    def __getitem__(self, z):
+        return self._floors[z]
+
+    def __iter__(self):
+        return iter(self._floors)
+
+
+class _SharedFloor:
+    __slots__ = ("codes", "start", "height", "width", "symbols", "private_rows")
+
+    def __init__(self, codes, start, height, width, symbols):
+        self.codes = codes
+        self.start = start
+        self.height = height
+        self.width = width
+        self.symbols = symbols
+        self.private_rows = {}  # y -> list, rows this process has written to
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        row = self.private_rows.get(y)
+        if row is not None:
+            return row
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError("floor row out of range")
+        return _SharedRow(self, y)
+
+    def __iter__(self):
+        return (self[y] for y in range(self.height))
+
+
+class _SharedRow:
+    __slots__ = ("floor", "y", "codes")
+
+    def __init__(self, floor, y):
+        self.floor = floor
+        self.y = y
+        start = floor.start + y * floor.width
+        self.codes = floor.codes[start:start + floor.width]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, x):
+        return self.floor.symbols[self.codes[x]]
+
+    def __iter__(self):
+        return map(self.floor.symbols.__getitem__, self.codes)
+
+    def __setitem__(self, x, value):
+        # Copy on write: the row becomes a private list for this process.
+        row = list(self)
+        row[x] = value
+        self.floor.private_rows[self.y] = row
+
+
+def shared_slot_index(arrays):
+    cells = memoryview(arrays["slot_cells"])
+    width = arrays["codes"].shape[2]
+    return {(z, t): SharedSlotSet(z, width, cells, lo, hi) for z, t, lo, hi in _slot_groups(arrays)}
+
+
+_NO_CHANGES = frozenset()
+
+
+class SharedSlotSet:
+    # The set of free slots of one (floor, type) for set_slot_occupied() and
+    # indexed_free_slots(): the shared cells minus the ones this process took,
+    # plus the ones it freed that were occupied in the generation.
+    __slots__ = ("z", "width", "cells", "lo", "hi", "added", "removed")
+
+    def __init__(self, z, width, cells, lo, hi):
+        self.z = z
+        self.width = width
+        self.cells = cells  # cells[lo:hi] are this group's, sorted, so membership is a bisect
+        self.lo = lo
+        self.hi = hi
+        self.added = _NO_CHANGES
+        self.removed = _NO_CHANGES
+
+    def _shared(self, pos):
+        z, y, x = pos
+        cell = y * self.width + x
+        i = bisect.bisect_left(self.cells, cell, self.lo, self.hi)
+        return z == self.z and i < self.hi and self.cells[i] == cell
+
+    def __contains__(self, pos):
+        if pos in self.added:
+            return True
+        return pos not in self.removed and self._shared(pos)
+
+    def __len__(self):
+        return self.hi - self.lo - len(self.removed) + len(self.added)
+
+    def __iter__(self):
+        for cell in self.cells[self.lo:self.hi]:
+            pos = (self.z, cell // self.width, cell % self.width)
+            if pos not in self.removed:
+                yield pos
+        yield from self.added
+
+    def add(self, pos):
+        if pos in self.removed:
+            self.removed.discard(pos)
+        elif not self._shared(pos):
+            if self.added is _NO_CHANGES:
+                self.added = set()
+            self.added.add(pos)
+
+    def discard(self, pos):
+        if pos in self.added:
+            self.added.discard(pos)
+        elif self._shared(pos):
+            if self.removed is _NO_CHANGES:
+                self.removed = set()
+            self.removed.add(pos)
+
+
+# ---------- MAIN ----------
+if __name__ == "__main__":
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    maps_dir = os.path.join(base_dir, "maps")
+    artifact_path = os.path.join(base_dir, DEFAULT_ARTIFACT)
+    command = sys.argv[1] if len(sys.argv) > 1 else "compile"
+
+    if command == "compile":
+        arrays = compile_maps(maps_dir, artifact_path)
+        print(f"Compiled {len(arrays['codes'])} floors into {artifact_path} ({os.path.getsize(artifact_path)} bytes)")
+    elif command == "publish":
+        root = sys.argv[2] if len(sys.argv) > 2 else os.path.join(base_dir, "maps_shared")
+        print(f"Published {publish_shared(maps_dir, root)} in {root}")
+    elif command == "bench":
+        csv_time, artifact_time, numpy_import_time = measure_cold_start(maps_dir, artifact_path)
+        print(f"CSV floors + slot index: {csv_time * 1000:.2f} ms")
+        print(f"Precompiled artifact:    {artifact_time * 1000:.2f} ms (+ {numpy_import_time * 1000:.0f} ms to import NumPy)")
+    else:
+        print("Usage: python mapstore.py [compile|publish [dir]|bench]")
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# ---------- INSTRUMENTATION ----------
+# Counters and histograms exported in Prometheus text format at /metrics.
+# Turned on with PARKING_METRICS=1; when off every hook is a single flag check
+# (timed() and phase_clock() hand back shared no-op objects).
+
+ENABLED = os.environ.get("PARKING_METRICS", "") not in ("", "0")
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_HELP = {
+    "parking_phase_seconds": ("histogram", "Time spent per phase, summed over one map load, slot search (find_best_slot call) or page render.", DURATION_BUCKETS),
+    # _count and _sum are the searches run and their total expansions; the path
+    # length histogram only counts searches that found a path.
+    "parking_search_expansions": ("histogram", "Nodes expanded per search.", SIZE_BUCKETS),
+    "parking_search_path_length": ("histogram", "Cells on the path returned by a search.", SIZE_BUCKETS),
+    "parking_search_heap_pushes_total": ("counter", "Frontier pushes by all searches.", None),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_NULL = nullcontext()
+
+
+def set_enabled(enabled):
+    global ENABLED
+    ENABLED = enabled
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def inc(name, value=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    buckets = _HELP[name][2]
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * len(buckets), 0, 0]
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                hist[0][i] += 1
+        hist[1] += value
+        hist[2] += 1
+
+
+@contextmanager
+def _timer(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("parking_phase_seconds", time.perf_counter() - start, phase=phase)
+
+
+def timed(phase):
+    # with metrics.timed("car_search"): ...
+    if not ENABLED:
+        return _NULL
+    return _timer(phase)
+
+
+class PhaseClock:
+    # Sums time per phase over one find_best_slot() call, whose phases repeat
+    # for every candidate slot, and observes each total once in flush().
+    def __init__(self):
+        self.totals = {}
+        self._start = 0.0
+
+    def start(self):
+        self._start = time.perf_counter()
+
+    def stop(self, phase):
+        self.totals[phase] = self.totals.get(phase, 0.0) + time.perf_counter() - self._start
+
+    def flush(self):
+        for phase, total in self.totals.items():
+            observe("parking_phase_seconds", total, phase=phase)
+        self.totals = {}
+
+
+class _NullClock:
+    def start(self):
+        pass
+
+    def stop(self, phase):
+        pass
+
+    def flush(self):
+        pass
+
+
+_NULL_CLOCK = _NullClock()
+
+
+def phase_clock():
+    if not ENABLED:
+        return _NULL_CLOCK
+    return PhaseClock()
+
+
+def record_search(algo, is_pedestrian, expansions, pushes, path):
+    kind = "lobby" if is_pedestrian else "car"
+    inc("parking_search_heap_pushes_total", pushes, algo=algo, kind=kind)
+    observe("parking_search_expansions", expansions, algo=algo, kind=kind)
+    if path:
+        observe("parking_search_path_length", len(path), algo=algo, kind=kind)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render():
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, (list(h[0]), h[1], h[2])) for k, h in _histograms.items())
+
+    for name, (kind, help_text, buckets) in _HELP.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (n, labels), value in counters:
+                if n == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        else:
+            for (n, labels), (counts, total, count) in histograms:
+                if n != name:
+                    continue
+                for bound, c in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {c}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
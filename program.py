@@ -2,9 +2,12 @@ import csv
 import math
 import heapq
 import os
+import threading
 import time
 from collections import deque
 
+import metrics
+
 # ---------- GRID UTILS ----------
 def read_csv_grid(filename):
     with open(filename, "r") as f:
@@ -39,8 +42,9 @@ def heuristic_blind(pos, desired_floor):
     # We can weight it to encourage moving to that floor.
     return abs(pos[0] - desired_floor) * 10
 
-def can_move(floors, z, y, x, dy, dx, is_pedestrian=False):
-    cell = floors[z][y][x]
+def can_move(floors, z, y, x, dy, dx, is_pedestrian=False, cell=None):
+    if cell is None:
+        cell = floors[z][y][x]
     
     # Pedestrians can move freely from any walkable tile (except walls)
     # They ignore one-way signs.
@@ -62,13 +66,17 @@ def can_move(floors, z, y, x, dy, dx, is_pedestrian=False):
 def get_neighbors(pos, floors, goal=None, is_pedestrian=False):
     z, y, x = pos
     neighbors = []
-    height, width = len(floors[z]), len(floors[z][0])
+    # Look the floor and current row up once; shared floors decode on access.
+    floor = floors[z]
+    row = floor[y]
+    cur = row[x]
+    height, width = len(floor), len(row)
     directions = [(-1,0),(1,0),(0,-1),(0,1)]
 
     for dy, dx in directions:
         ny, nx = y + dy, x + dx
         if 0 <= ny < height and 0 <= nx < width:
-            dest = floors[z][ny][nx]
+            dest = (row if ny == y else floor[ny])[nx]
             # skip walls
             if dest == "#":
                 continue
@@ -87,15 +95,14 @@ def get_neighbors(pos, floors, goal=None, is_pedestrian=False):
                 # destination is not a road and not the goal -> cannot move into it
                 continue
             # check source allows exiting in this direction
-            allowed = can_move(floors, z, y, x, dy, dx, is_pedestrian)
+            allowed = can_move(floors, z, y, x, dy, dx, is_pedestrian, cur)
             
             # Allow turning into a parking slot from a directional road
             if not allowed and not is_pedestrian and is_target:
-                cur_cell = floors[z][y][x]
-                if cur_cell == "^" and dy != 1: allowed = True      # Allow except backward (South)
-                elif cur_cell in ["v", "V"] and dy != -1: allowed = True # Allow except backward (North)
-                elif cur_cell == "<" and dx != 1: allowed = True    # Allow except backward (East)
-                elif cur_cell == ">" and dx != -1: allowed = True   # Allow except backward (West)
+                if cur == "^" and dy != 1: allowed = True      # Allow except backward (South)
+                elif cur in ["v", "V"] and dy != -1: allowed = True # Allow except backward (North)
+                elif cur == "<" and dx != 1: allowed = True    # Allow except backward (East)
+                elif cur == ">" and dx != -1: allowed = True   # Allow except backward (West)
 
             if allowed:
                 neighbors.append((z, ny, nx))
@@ -104,7 +111,6 @@ def get_neighbors(pos, floors, goal=None, is_pedestrian=False):
     # 'T' = turun (down): can move down to floor z-1 if that cell is 'e' (entrance on lower floor)
     # 'E' on an upper floor can move down to a matching 'N' below
     # 'e' on a lower floor can move up to a matching 'T' above
-    cur = floors[z][y][x]
     # Up from 'N' -> 'E'
     if cur == 'N' and z + 1 < len(floors) and floors[z+1][y][x] == 'E':
         neighbors.append((z+1, y, x))
@@ -117,24 +123,59 @@ def get_neighbors(pos, floors, goal=None, is_pedestrian=False):
     # Vertical movement is only allowed from 'N' -> 'E' (up) and 'T' -> 'e' (down).
     return neighbors
 
+def search_result(algo, is_pedestrian, path, visited_order, pushes):
+    # Every search returns through here so its counters reach /metrics.
+    if metrics.ENABLED:
+        metrics.record_search(algo, is_pedestrian, len(visited_order), pushes, path)
+    return path, visited_order
+
+# ---------- CONGESTION ----------
+# Optional cost model for car searches: entering a cell costs 1 plus `weight`
+# for every car currently assigned to drive through it. Only A* and Dijkstra
+# use edge costs; BFS and Greedy BFS ignore them. Without a congestion model
+# every move costs 1, as before.
+def new_congestion(weight=0.5):
+    return {"weight": weight, "load": {}}
+
+def add_traffic(congestion, cells, amount=1):
+    load = congestion["load"]
+    for cell in cells:
+        value = load.get(cell, 0) + amount
+        if value > 0:
+            load[cell] = value
+        else:
+            load.pop(cell, None)
+
+def move_cost(congestion, cell):
+    if congestion is None:
+        return 1
+    return 1 + congestion["weight"] * congestion["load"].get(cell, 0)
+
+def path_cost(congestion, path):
+    # Same as len(path) when there is no congestion, so scores stay comparable.
+    if congestion is None:
+        return len(path)
+    return 1 + sum(move_cost(congestion, cell) for cell in path[1:])
+
 # ---------- PATHFINDING ALGORITHMS ----------
-def pathfind(floors, start, goal, algo="a_star", is_pedestrian=False, desired_floor=None):
+def pathfind(floors, start, goal, algo="a_star", is_pedestrian=False, desired_floor=None, congestion=None):
     if algo == "bfs":
         return bfs(floors, start, goal, is_pedestrian, desired_floor)
     elif algo == "dijkstra":
-        return dijkstra(floors, start, goal, is_pedestrian, desired_floor)
+        return dijkstra(floors, start, goal, is_pedestrian, desired_floor, congestion)
     # *** DIUBAH: Sekarang memanggil "greedy_bfs" ***
     elif algo == "greedy_bfs": 
         return greedy_bfs(floors, start, goal, is_pedestrian, desired_floor)
     else:
-        return a_star(floors, start, goal, is_pedestrian, desired_floor)
+        return a_star(floors, start, goal, is_pedestrian, desired_floor, congestion)
 
-def a_star(floors, start, goal, is_pedestrian=False, desired_floor=None):
+def a_star(floors, start, goal, is_pedestrian=False, desired_floor=None, congestion=None):
     open_set = []
     heapq.heappush(open_set, (0, start))
     came_from = {}
     g_score = {start: 0}
     visited_order = []
+    pushes = 1
 
     # Check if goal is coordinate or symbol
     is_blind = isinstance(goal, str)
@@ -160,11 +201,11 @@ def a_star(floors, start, goal, is_pedestrian=False, desired_floor=None):
                 path.append(current)
                 current = came_from[current]
             path.append(start)
-            return path[::-1], visited_order
+            return search_result("a_star", is_pedestrian, path[::-1], visited_order, pushes)
             
         # Pass goal to get_neighbors even if blind, so it can check if neighbor is the target symbol
         for neighbor in get_neighbors(current, floors, goal, is_pedestrian):
-            tentative_g = g_score[current] + 1
+            tentative_g = g_score[current] + move_cost(congestion, neighbor)
             if tentative_g < g_score.get(neighbor, float("inf")):
                 came_from[neighbor] = current
                 g_score[neighbor] = tentative_g
@@ -176,13 +217,15 @@ def a_star(floors, start, goal, is_pedestrian=False, desired_floor=None):
                     
                 f_score = tentative_g + h
                 heapq.heappush(open_set, (f_score, neighbor))
-    return None, visited_order
+                pushes += 1
+    return search_result("a_star", is_pedestrian, None, visited_order, pushes)
 
-def dijkstra(floors, start, goal, is_pedestrian=False, desired_floor=None):
+def dijkstra(floors, start, goal, is_pedestrian=False, desired_floor=None, congestion=None):
     pq = [(0, start)]
     came_from = {}
     dist = {start: 0}
     visited_order = []
+    pushes = 1
     
     # Check if goal is coordinate or symbol
     is_blind = isinstance(goal, str)
@@ -208,21 +251,23 @@ def dijkstra(floors, start, goal, is_pedestrian=False, desired_floor=None):
                 path.append(current)
                 current = came_from[current]
             path.append(start)
-            return path[::-1], visited_order
+            return search_result("dijkstra", is_pedestrian, path[::-1], visited_order, pushes)
             
         # Pass goal to get_neighbors even if blind
         for neighbor in get_neighbors(current, floors, goal, is_pedestrian):
-            new_cost = cost + 1
+            new_cost = cost + move_cost(congestion, neighbor)
             if new_cost < dist.get(neighbor, float("inf")):
                 dist[neighbor] = new_cost
                 came_from[neighbor] = current
                 heapq.heappush(pq, (new_cost, neighbor))
-    return None, visited_order
+                pushes += 1
+    return search_result("dijkstra", is_pedestrian, None, visited_order, pushes)
 
 def bfs(floors, start, goal, is_pedestrian=False, desired_floor=None):
     queue = deque([start])
     came_from = {start: None}
     visited_order = []
+    pushes = 1
     
     # Check if goal is coordinate or symbol
     is_blind = isinstance(goal, str)
@@ -247,14 +292,15 @@ def bfs(floors, start, goal, is_pedestrian=False, desired_floor=None):
             while current:
                 path.append(current)
                 current = came_from[current]
-            return path[::-1], visited_order
+            return search_result("bfs", is_pedestrian, path[::-1], visited_order, pushes)
             
         # Pass goal to get_neighbors even if blind
         for neighbor in get_neighbors(current, floors, goal, is_pedestrian):
             if neighbor not in came_from:
                 came_from[neighbor] = current
                 queue.append(neighbor)
-    return None, visited_order
+                pushes += 1
+    return search_result("bfs", is_pedestrian, None, visited_order, pushes)
 
 # *** DIUBAH: Menggantikan DFS dengan Greedy BFS ***
 def greedy_bfs(floors, start, goal, is_pedestrian=False, desired_floor=None):
@@ -271,6 +317,7 @@ def greedy_bfs(floors, start, goal, is_pedestrian=False, desired_floor=None):
     heapq.heappush(open_set, (h, start))
     came_from = {start: None} 
     visited_order = []
+    pushes = 1
 
     while open_set:
         _, current = heapq.heappop(open_set)
@@ -292,7 +339,7 @@ def greedy_bfs(floors, start, goal, is_pedestrian=False, desired_floor=None):
             while current:
                 path.append(current)
                 current = came_from[current]
-            return path[::-1], visited_order
+            return search_result("greedy_bfs", is_pedestrian, path[::-1], visited_order, pushes)
 
         # Pass goal to get_neighbors even if blind
         for neighbor in get_neighbors(current, floors, goal, is_pedestrian):
@@ -305,8 +352,9 @@ def greedy_bfs(floors, start, goal, is_pedestrian=False, desired_floor=None):
                     priority = heuristic(neighbor, goal)
                     
                 heapq.heappush(open_set, (priority, neighbor))
+                pushes += 1
     
-    return None, visited_order
+    return search_result("greedy_bfs", is_pedestrian, None, visited_order, pushes)
 
 # ---------- SLOT SEARCH ----------
 def find_positions(floors, symbol):
@@ -318,13 +366,78 @@ def find_positions(floors, symbol):
                     positions.append((z, y, x))
     return positions
 
-def find_best_slot(floors, algo="a_star", target_symbol="P", desired_floor=None, w_lobby=2, w_car=1):
+# ---------- SLOT INDEX ----------
+SLOT_TYPES = ("p", "l", "d")
+
+# Serializes occupancy updates against index snapshots, since the app shares
+# one floors grid and slot index between all request threads. Searches that
+# already hold a snapshot may still see a slot change underneath them.
+_slot_lock = threading.Lock()
+
+def build_slot_index(floors):
+    # Maps (floor, free slot symbol) -> set of free slot positions on that floor.
+    # Every (floor, type) key exists, so counts are always a plain len().
+    slot_index = {}
+    for z, floor in enumerate(floors):
+        for t in SLOT_TYPES:
+            slot_index[(z, t)] = set()
+        for y, row in enumerate(floor):
+            for x, val in enumerate(row):
+                if val in SLOT_TYPES:
+                    slot_index[(z, val)].add((z, y, x))
+    return slot_index
+
+def set_slot_occupied(floors, slot_index, pos, occupied=True):
+    # Flip a slot between free (lowercase) and occupied (uppercase) on the grid
+    # and keep the index in step with it.
+    z, y, x = pos
+    with _slot_lock:
+        free_symbol = floors[z][y][x].lower()
+        if free_symbol not in SLOT_TYPES:
+            raise ValueError(f"Floor {z} ({x+1},{y+1}) is not a parking slot.")
+        if occupied:
+            floors[z][y][x] = free_symbol.upper()
+            slot_index[(z, free_symbol)].discard(pos)
+        else:
+            floors[z][y][x] = free_symbol
+            slot_index[(z, free_symbol)].add(pos)
+
+def indexed_free_slots(slot_index, target_lower):
+    # Same ordering as find_positions (floor, row, column), but floors without
+    # a free slot of the requested type are skipped entirely.
+    positions = []
+    z = 0
+    with _slot_lock:
+        while (z, target_lower) in slot_index:
+            free = slot_index[(z, target_lower)]
+            if free:
+                positions.extend(sorted(free))
+            z += 1
+    return positions
+
+def availability(slot_index):
+    # Free slot counts per floor and type, e.g. {0: {"P": 3, "L": 0, "D": 1}}.
+    counts = {}
+    with _slot_lock:
+        for (z, t), free in slot_index.items():
+            counts.setdefault(z, {})[t.upper()] = len(free)
+    return counts
+
+def find_best_slot(floors, algo="a_star", target_symbol="P", desired_floor=None, w_lobby=2, w_car=1, slot_index=None, congestion=None):
+    # Each phase is summed over all candidate slots and observed once per call.
+    clock = metrics.phase_clock()
+    clock.start()
     cars = find_positions(floors, "C")
     target_lower = target_symbol.lower()
-    slots = find_positions(floors, target_lower)
+    if slot_index is not None:
+        slots = indexed_free_slots(slot_index, target_lower)
+    else:
+        slots = find_positions(floors, target_lower)
     lobbies = find_positions(floors, "O")
+    clock.stop("slot_enumeration")
 
     if not cars or not slots:
+        clock.flush()
         print(f"[!] Missing required symbols (C or {target_lower}).")
         return None
 
@@ -340,7 +453,9 @@ def find_best_slot(floors, algo="a_star", target_symbol="P", desired_floor=None,
         z, y, x = slot
         
         # 1. Calculate Car -> Slot path
-        path_car, visited_car = pathfind(floors, car, slot, algo, is_pedestrian=False)
+        clock.start()
+        path_car, visited_car = pathfind(floors, car, slot, algo, is_pedestrian=False, congestion=congestion)
+        clock.stop("car_search")
         if not path_car:
             continue
 
@@ -354,6 +469,7 @@ def find_best_slot(floors, algo="a_star", target_symbol="P", desired_floor=None,
         if not lobbies_on_floor:
             lobby_dist = 9999
         else:
+            clock.start()
             for lobby in lobbies_on_floor:
                 p_l, v_l = pathfind(floors, lobby, slot, algo, is_pedestrian=True)
                 if p_l:
@@ -362,6 +478,7 @@ def find_best_slot(floors, algo="a_star", target_symbol="P", desired_floor=None,
                         min_lobby_dist = dist
                         path_lobby = p_l
                         visited_lobby = v_l
+            clock.stop("lobby_search")
             
             if path_lobby is None:
                 lobby_dist = 9999
@@ -370,7 +487,8 @@ def find_best_slot(floors, algo="a_star", target_symbol="P", desired_floor=None,
 
         # 3. Calculate Score
         # score = jarak(Car->Slot) * w_car + jarak(Lobby->Slot) * w_lobby + (|floor - desired_floor| * 1000)
-        car_dist = len(path_car)
+        clock.start()
+        car_dist = path_cost(congestion, path_car)
         floor_penalty = 0
         if desired_floor is not None:
             floor_penalty = abs(z - desired_floor) * 1000
@@ -384,7 +502,9 @@ def find_best_slot(floors, algo="a_star", target_symbol="P", desired_floor=None,
             best_path_lobby = path_lobby
             best_visited_car = visited_car
             best_visited_lobby = visited_lobby
+        clock.stop("scoring")
 
+    clock.flush()
     if not best_slot:
         print("[!] No valid parking slot found.")
         return None
@@ -0,0 +1,146 @@
+import argparse
+import heapq
+import io
+import random
+import time
+from contextlib import redirect_stdout
+
+from program import (
+    load_floors, find_best_slot, build_slot_index, set_slot_occupied,
+    new_congestion, add_traffic,
+)
+
+# ---------- GARAGE SIMULATOR ----------
+# Discrete-event simulation of a busy garage. Cars arrive at the entrance as a
+# Poisson stream, are routed by find_best_slot(), drive their path one cell at
+# a time, park, and leave again after an exponential dwell. Every assigned car
+# adds load to the cells still ahead of it and removes it as it drives past;
+# a cell shared with other cars takes `slowdown` longer per extra car. With
+# congestion enabled the router sees that load, so later cars are steered
+# around busy lanes and ramps.
+#
+#   python simulate.py --arrivals 1000 --rate 6 --congestion 0.5
+#   python simulate.py --arrivals 1000 --rate 6 --congestion 0      # unit costs
+
+
+ARRIVAL_MIX = {"P": 8, "L": 1, "D": 1}
+
+
+def vacate_slots(floors, slot_index, count, rng):
+    # The bundled maps are almost full; free some slots, split like the arrival
+    # mix, so there is room to play.
+    total_weight = sum(ARRIVAL_MIX.values())
+    for symbol, weight in ARRIVAL_MIX.items():
+        occupied = [(z, y, x) for z, floor in enumerate(floors) for y, row in enumerate(floor)
+                    for x, val in enumerate(row) if val == symbol]
+        share = round(count * weight / total_weight)
+        for pos in rng.sample(occupied, min(share, len(occupied))):
+            set_slot_occupied(floors, slot_index, pos, occupied=False)
+
+
+def simulate(floors, arrivals=1000, rate=6.0, dwell=5.0, algo="a_star", congestion_weight=0.5,
+             cell_seconds=2.0, slowdown=0.1, vacate=60, seed=0):
+    # rate is cars per minute, dwell the mean parking time in minutes.
+    rng = random.Random(seed)
+    slot_index = build_slot_index(floors)
+    vacate_slots(floors, slot_index, vacate, rng)
+    congestion = new_congestion(congestion_weight) if congestion_weight > 0 else None
+    traffic = congestion if congestion is not None else new_congestion(0)
+
+    events = []  # (time in seconds, sequence, kind, payload)
+    seq = 0
+
+    def schedule(at, kind, payload):
+        nonlocal seq
+        heapq.heappush(events, (at, seq, kind, payload))
+        seq += 1
+
+    t = 0.0
+    for _ in range(arrivals):
+        t += rng.expovariate(rate / 60.0)
+        schedule(t, "arrive", rng.choices(list(ARRIVAL_MIX), weights=list(ARRIVAL_MIX.values()))[0])
+
+    parked = 0
+    rejected = 0
+    search_times = []
+    drive_times = []
+    peak_load = 0
+    last_park = 0.0
+
+    while events:
+        now, _, kind, payload = heapq.heappop(events)
+        if kind == "arrive":
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):  # a full garage is expected here, not worth a warning
+                result = find_best_slot(floors, algo, payload, None, slot_index=slot_index, congestion=congestion)
+            search_times.append(time.perf_counter() - start)
+            if not result:
+                rejected += 1
+                continue
+            slot, path_car = result[0], result[1]
+            set_slot_occupied(floors, slot_index, slot)
+            ahead = path_car[1:]
+            add_traffic(traffic, ahead)
+            drive = 0.0
+            for cell in ahead:
+                load = traffic["load"][cell]
+                peak_load = max(peak_load, load)
+                drive += cell_seconds * (1 + slowdown * (load - 1))
+                schedule(now + drive, "pass", cell)
+            drive_times.append(drive)
+            schedule(now + drive, "park", slot)
+        elif kind == "pass":
+            add_traffic(traffic, [payload], -1)
+        elif kind == "park":
+            parked += 1
+            last_park = now
+            schedule(now + rng.expovariate(1.0 / (dwell * 60.0)), "leave", payload)
+        elif kind == "leave":
+            set_slot_occupied(floors, slot_index, payload, occupied=False)
+
+    sim_minutes = last_park / 60.0 if last_park else 0.0
+    routing_seconds = sum(search_times)
+    mean_search = routing_seconds / len(search_times) if search_times else 0.0
+    mean_drive = sum(drive_times) / len(drive_times) if drive_times else 0.0
+    return {
+        "arrivals": arrivals,
+        "parked": parked,
+        "rejected": rejected,
+        "sim_minutes": sim_minutes,
+        "throughput": parked / sim_minutes if sim_minutes else 0.0,
+        "mean_search": mean_search,
+        "max_search": max(search_times) if search_times else 0.0,
+        "mean_drive": mean_drive,
+        "peak_load": peak_load,
+        # How many times faster than real time the router ran; below 1 it cannot keep up.
+        "realtime_factor": (sim_minutes * 60.0) / routing_seconds if routing_seconds else float("inf"),
+        "mean_gap": 60.0 / rate,
+    }
+
+
+# ---------- MAIN ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate arrivals through find_best_slot.")
+    parser.add_argument("--arrivals", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=6.0, help="arrivals per minute")
+    parser.add_argument("--dwell", type=float, default=5.0, help="mean parking time in minutes")
+    parser.add_argument("--algo", default="a_star", choices=["a_star", "dijkstra", "bfs", "greedy_bfs"])
+    parser.add_argument("--congestion", type=float, default=0.5, help="extra cost per car on a cell (0 = off)")
+    parser.add_argument("--cell-seconds", type=float, default=2.0, help="driving time per cell")
+    parser.add_argument("--slowdown", type=float, default=0.1, help="extra driving time per car sharing a cell")
+    parser.add_argument("--vacate", type=int, default=60, help="occupied slots to free before the run")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stats = simulate(load_floors("maps"), args.arrivals, args.rate, args.dwell, args.algo,
+                     args.congestion, args.cell_seconds, args.slowdown, args.vacate, args.seed)
+
+    print(f"Arrivals:           {stats['arrivals']} ({stats['parked']} parked, {stats['rejected']} turned away)")
+    print(f"Simulated time:     {stats['sim_minutes']:.1f} min")
+    print(f"Throughput:         {stats['throughput']:.2f} cars parked / min")
+    print(f"Search time:        {stats['mean_search'] * 1000:.1f} ms mean, {stats['max_search'] * 1000:.1f} ms max")
+    print(f"Drive time:         {stats['mean_drive']:.1f} s mean")
+    print(f"Search + drive:     {stats['mean_search'] + stats['mean_drive']:.1f} s mean")
+    print(f"Peak cell load:     {stats['peak_load']} cars")
+    print(f"Real-time factor:   {stats['realtime_factor']:.1f}x "
+          f"(mean gap between arrivals {stats['mean_gap']:.1f} s)")